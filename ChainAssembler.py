@@ -1,6 +1,8 @@
 #! usr/bin/env python
-from ROOT import TChain
+from ROOT import TChain, TFile, TH1D, TH2D
+from math import ceil, sqrt
 import os
+import random
 
 class ChainAssembler:
 
@@ -10,6 +12,21 @@ class ChainAssembler:
         self.outFilePaths = []
         self.chain = None
 
+        # For quick previews: read only this fraction of the files. Files 
+        # are picked at random (but reproducibly, from sampleSeed), so with
+        # the same seed a bigger fraction always includes the files from a
+        # smaller one, and the preview can be refined up to the full data.
+        # The scale is the file ratio, so every ntuple from the same job 
+        # directory and seed gets the same one.
+        self.sampleFraction = 1.0
+        self.sampleSeed = 0
+        self.sampledFilePaths = []
+        self.sampleScale = 1.0
+        # entries in each sampled file, and the relative sampling 
+        # uncertainty on totals that comes from their spread
+        self.perFileEntries = []
+        self.samplingRelErr = 0.0
+
     def _isRootFile(self, filename):
         retval = False
         if filename[:4] == "nts." and filename[-5:] == ".root":
@@ -44,7 +61,98 @@ class ChainAssembler:
         if self.ntuplePath is None:
             raise RuntimeError("ChainAssembler: must specify ntuplePath (ntuple name and directory in root files)")
         if len(self.outFilePaths) == 0: self._collectOutFilePaths()
+        if self.sampleFraction >= 1.0:
+            self.sampledFilePaths = list(self.outFilePaths)
+        else:
+            self._pickSampledFiles()
         self.chain = TChain(self.ntuplePath)
-        for filepath in self.outFilePaths:
+        for filepath in self.sampledFilePaths:
             self.chain.Add(filepath)
+        if self.sampleFraction < 1.0:
+            self.sampleScale = float(len(self.outFilePaths)) / len(self.sampledFilePaths)
+            self._countSampledEntries()
         return self.chain
+
+    def _pickSampledFiles(self):
+        if self.sampleFraction <= 0.0:
+            raise RuntimeError("ChainAssembler: sampleFraction must be greater than 0")
+        shuffled = sorted(self.outFilePaths)
+        random.Random(self.sampleSeed).shuffle(shuffled)
+        numFiles = max(1, int(ceil(self.sampleFraction * len(shuffled))))
+        self.sampledFilePaths = shuffled[:numFiles]
+
+    def _countSampledEntries(self):
+        # Only opens the sampled files, which get read anyway. Files are the
+        # sampling unit (entries within one are correlated hits from the 
+        # same events), so the uncertainty comes from the file-to-file 
+        # spread of the totals.
+        self.perFileEntries = []
+        for filepath in self.sampledFilePaths:
+            rootFile = TFile(filepath, "READ")
+            ntuple = rootFile.Get(self.ntuplePath)
+            self.perFileEntries.append(ntuple.GetEntries() if ntuple else 0)
+            rootFile.Close()
+        estimate, uncertainty = self.clusterUncertainty(self.perFileEntries)
+        self.samplingRelErr = uncertainty / estimate if estimate > 0 else float('nan')
+
+    def clusterUncertainty(self, perFileTotals):
+        # Estimates the full data set total from the totals of some quantity
+        # in each sampled file, with its sampling uncertainty (cluster
+        # sampling, with the finite population correction so it goes to 0
+        # for the full set). Returns the estimate and its uncertainty; the
+        # uncertainty is nan if it can't be estimated from a single file.
+        numFiles = len(self.outFilePaths)
+        numSampled = len(perFileTotals)
+        mean = sum(perFileTotals) / float(numSampled)
+        estimate = numFiles * mean
+        if numSampled >= numFiles:
+            return estimate, 0.0
+        if numSampled < 2:
+            return estimate, float('nan')
+        spread = sum((t - mean)**2 for t in perFileTotals) / (numSampled - 1)
+        uncertainty = numFiles * sqrt((1.0 - float(numSampled)/numFiles) * spread / numSampled)
+        return estimate, uncertainty
+
+    def scaleCount(self, count, perFileCounts=None):
+        # Scales a count from the sampled chain up to the full data set. 
+        # Returns the estimate and its sampling uncertainty. With the count
+        # for each sampled file, the uncertainty comes from their spread;
+        # otherwise it assumes the count follows the ntuple's entries.
+        if perFileCounts is not None:
+            return self.clusterUncertainty(perFileCounts)
+        estimate = count * self.sampleScale
+        return estimate, estimate * self.samplingRelErr
+
+    def _floatCopy(self, hist):
+        # Same binning, contents and errors, but with double bins. The copy
+        # takes over the name; the original gets "_int" added.
+        name = hist.GetName()
+        hist.SetName(name+"_int")
+        xaxis = hist.GetXaxis()
+        yaxis = hist.GetYaxis()
+        if hist.GetDimension() == 1:
+            floatHist = TH1D(name, hist.GetTitle(), xaxis.GetNbins(), xaxis.GetXmin(), xaxis.GetXmax())
+        else:
+            floatHist = TH2D(name, hist.GetTitle(), xaxis.GetNbins(), xaxis.GetXmin(), xaxis.GetXmax(), yaxis.GetNbins(), yaxis.GetXmin(), yaxis.GetXmax())
+        floatHist.Sumw2()
+        floatHist.Add(hist)
+        floatHist.GetXaxis().SetTitle(xaxis.GetTitle())
+        floatHist.GetYaxis().SetTitle(yaxis.GetTitle())
+        return floatHist
+
+    def scaleHist(self, hist):
+        # Scales a histogram made from the sampled chain up to the full data
+        # set. Bin errors get scaled too. Integer histograms (TH1I, TH2I) 
+        # would truncate the scaled contents, so those get scaled as a 
+        # double copy instead. Use the returned histogram.
+        if self.sampleScale == 1.0:
+            return hist
+        if hist.InheritsFrom("TArrayI") or hist.InheritsFrom("TArrayS") or hist.InheritsFrom("TArrayC"):
+            hist = self._floatCopy(hist)
+        hist.Scale(self.sampleScale)
+        return hist
+
+    def samplingSummary(self):
+        if self.sampleFraction >= 1.0:
+            return "{0}: all {1} files".format(self.ntuplePath, len(self.sampledFilePaths))
+        return "{0}: previewing {1} of {2} files ({3} entries), scaled by {4:.3f}, sampling uncertainty on totals {5:.2%}".format(self.ntuplePath, len(self.sampledFilePaths), len(self.outFilePaths), sum(self.perFileEntries), self.sampleScale, self.samplingRelErr)
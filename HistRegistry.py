@@ -0,0 +1,210 @@
+#! usr/bin/env python
+from ROOT import TFile, TObject, TDirectory, SetOwnership
+from collections import OrderedDict
+import os
+import tempfile
+
+class HistRegistry:
+    """ This is for holding onto histograms across many jobs with bounded
+    memory. Histograms are kept per job, so same-named histograms from
+    different jobs don't collide, and are taken out of ROOT's global
+    directory. When the held histograms go over maxBytes, the least recently
+    used ones are written to spillFilePath and dropped from memory; they get
+    read back in transparently when accessed again.
+
+    Indexing works like a dict of the current job's histograms, where the
+    current job is the one that last had a histogram added. The spill file
+    is deleted when the registry is cleared or goes away. """
+
+    def __init__(self):
+        # By default, spill to disk once held histograms take up more than
+        # 512 MB. None means no limit.
+        self.maxBytes = 512 * 1024**2
+        # Unique to this registry, so other registries (in this process or
+        # another one) can't overwrite its spilled histograms.
+        self.spillFilePath = os.path.join(tempfile.gettempdir(), "heldHists_spill_{0}_{1}.root".format(os.getpid(), id(self)))
+        self.currentJob = None
+        self.memoryBytes = 0
+
+        # internal data
+        self._inMemory = OrderedDict() # (job, name): hist, least recently used first
+        self._sizes = {}
+        self._spilled = set()
+        self._spillFileCreated = False
+
+    def _key(self, name, jobName):
+        if jobName is None:
+            jobName = self.currentJob
+        if jobName is None:
+            jobName = ""
+        return (jobName, name)
+
+    def _dirName(self, jobName):
+        if jobName == "":
+            return "noJob"
+        return jobName
+
+    def _estimateBytes(self, hist):
+        # bin contents, plus sum of squared weights if there is one, plus a
+        # rough allowance for everything else in the object
+        bytesPerCell = 4
+        if hist.InheritsFrom("TArrayD"):
+            bytesPerCell = 8
+        elif hist.InheritsFrom("TArrayS"):
+            bytesPerCell = 2
+        elif hist.InheritsFrom("TArrayC"):
+            bytesPerCell = 1
+        return hist.GetNcells() * bytesPerCell + hist.GetSumw2N() * 8 + 1024
+
+    def _spill(self, key, hist):
+        jobName, name = key
+        mode = "UPDATE"
+        if not self._spillFileCreated:
+            # don't mix in histograms from some earlier session
+            mode = "RECREATE"
+            self._spillFileCreated = True
+        # TContext puts gDirectory back the way the user had it
+        with TDirectory.TContext():
+            spillFile = TFile(self.spillFilePath, mode)
+            jobDir = spillFile.GetDirectory(self._dirName(jobName))
+            if not jobDir:
+                jobDir = spillFile.mkdir(self._dirName(jobName))
+            jobDir.cd()
+            hist.Write(name, TObject.kOverwrite)
+            spillFile.Close()
+        self._spilled.add(key)
+
+    def _reload(self, key):
+        jobName, name = key
+        with TDirectory.TContext():
+            spillFile = TFile(self.spillFilePath, "READ")
+            hist = spillFile.Get(self._dirName(jobName)+"/"+name)
+            if not hist:
+                spillFile.Close()
+                raise KeyError("HistRegistry: histogram {0} for job {1} is missing from spill file {2}".format(name, jobName, self.spillFilePath))
+            hist.SetDirectory(0)
+            SetOwnership(hist, True)
+            spillFile.Close()
+        return hist
+
+    def _deleteSpilled(self, keys):
+        # frees their space in the spill file, and removes the file once 
+        # nothing is left in it
+        keys = [k for k in keys if k in self._spilled]
+        if len(keys) == 0:
+            return
+        self._spilled.difference_update(keys)
+        if len(self._spilled) == 0:
+            self._removeSpillFile()
+            return
+        with TDirectory.TContext():
+            spillFile = TFile(self.spillFilePath, "UPDATE")
+            for jobName, name in keys:
+                jobDir = spillFile.GetDirectory(self._dirName(jobName))
+                if jobDir:
+                    jobDir.Delete(name+";*")
+            spillFile.Close()
+
+    def _removeSpillFile(self):
+        if self._spillFileCreated and os.path.isfile(self.spillFilePath):
+            os.remove(self.spillFilePath)
+        self._spillFileCreated = False
+
+    def _hold(self, key, hist):
+        if key in self._inMemory:
+            self.memoryBytes -= self._sizes[key]
+        self._inMemory[key] = hist
+        self._inMemory.move_to_end(key)
+        self._sizes[key] = self._estimateBytes(hist)
+        self.memoryBytes += self._sizes[key]
+        self._evict()
+
+    def _evict(self):
+        # always keeps the most recently used histogram in memory
+        if self.maxBytes is None:
+            return
+        while self.memoryBytes > self.maxBytes and len(self._inMemory) > 1:
+            key, hist = self._inMemory.popitem(last=False)
+            self._spill(key, hist)
+            self.memoryBytes -= self._sizes.pop(key)
+            del hist
+
+    def add(self, name, hist, jobName=None):
+        if jobName is not None:
+            self.currentJob = jobName
+        key = self._key(name, jobName)
+        hist.SetDirectory(0)
+        # an old spilled copy is out of date now
+        self._spilled.discard(key)
+        self._hold(key, hist)
+
+    def get(self, name, jobName=None):
+        key = self._key(name, jobName)
+        if key in self._inMemory:
+            self._inMemory.move_to_end(key)
+            return self._inMemory[key]
+        if key in self._spilled:
+            hist = self._reload(key)
+            self._hold(key, hist)
+            return hist
+        raise KeyError("HistRegistry: no histogram {0} for job {1}".format(key[1], key[0]))
+
+    def remove(self, name, jobName=None):
+        key = self._key(name, jobName)
+        if key not in self._inMemory and key not in self._spilled:
+            raise KeyError("HistRegistry: no histogram {0} for job {1}".format(key[1], key[0]))
+        if key in self._inMemory:
+            del self._inMemory[key]
+            self.memoryBytes -= self._sizes.pop(key)
+        self._deleteSpilled([key])
+
+    def removeJob(self, jobName):
+        # releases all of one job's histograms, in memory and spilled
+        jobKeys = [k for k in self.allKeys() if k[0] == jobName]
+        for key in jobKeys:
+            if key in self._inMemory:
+                del self._inMemory[key]
+                self.memoryBytes -= self._sizes.pop(key)
+        self._deleteSpilled(jobKeys)
+        if self.currentJob == jobName:
+            self.currentJob = None
+
+    def keys(self, jobName=None):
+        jobName = self._key(None, jobName)[0]
+        return [k[1] for k in self.allKeys() if k[0] == jobName]
+
+    def allKeys(self):
+        # (job, name) for every held histogram, in memory or spilled
+        return list(self._spilled.difference(self._inMemory.keys())) + list(self._inMemory.keys())
+
+    def jobNames(self):
+        return sorted(set(k[0] for k in self.allKeys()))
+
+    def clear(self):
+        self._inMemory = OrderedDict()
+        self._sizes = {}
+        self._spilled = set()
+        self.memoryBytes = 0
+        self._removeSpillFile()
+
+    def __del__(self):
+        try:
+            self._removeSpillFile()
+        except Exception:
+            # os may already be gone at interpreter shutdown
+            pass
+
+    def __getitem__(self, name):
+        return self.get(name)
+
+    def __setitem__(self, name, hist):
+        self.add(name, hist)
+
+    def __delitem__(self, name):
+        self.remove(name)
+
+    def __contains__(self, name):
+        return name in self.keys()
+
+    def __len__(self):
+        return len(self.keys())
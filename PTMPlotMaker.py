@@ -1,9 +1,12 @@
 #! usr/bin/env python
 from ChainAssembler import ChainAssembler
 from PTMReader import VirtDetReader, PTMVirtDetReader, PTMDetectorReader
+from ProfileStats import ProfileStats
+from HistRegistry import HistRegistry
 from ROOT import TH1F, TCanvas, TVector3
 from bisect import bisect_left
 from math import pi, sqrt
+import numpy as np
 
 class PTMPlotMaker:
 
@@ -55,6 +58,11 @@ class PTMPlotMaker:
         if position in wirePositions:
             return wirePositions.index(position)
         # otherwise
+        # off the ends of the plane, the end wires are closest
+        if position < wirePositions[0]:
+            return 0
+        if position > wirePositions[-1]:
+            return len(wirePositions) - 1
         insertionPoint = bisect_left(wirePositions, position)
         before = insertionPoint - 1
         after = insertionPoint
@@ -67,9 +75,10 @@ class PTMPlotMaker:
 
     @staticmethod
     def volIdToPosition(volId):
+        # same as PTMDetectorReader._volIdToPosition: wires at -47..47 mm
         numOnPlane = volId % 48
         centered = numOnPlane - 24
-        scaledPosition = centered * 2
+        scaledPosition = centered * 2 + 1
         return scaledPosition
 
     def __init__(self):
@@ -78,6 +87,8 @@ class PTMPlotMaker:
         self.makeScannerPlots = False
         self.makeTargetHists = False
         self.makePTMVirtualHists = False
+        self.makeVirtualScannerPlots = False
+        self.makeSignalSweep = False
         self.jobName = None
         self.verbose = False
         self.cleanupHists = True
@@ -89,6 +100,28 @@ class PTMPlotMaker:
         # plane is 5%. This is distributed evenly over all the wires in the 
         # plane.
         self.totalSignalErr = 0.05
+        # For scanner plots made from the PTM virtual detectors: signal per
+        # particle hitting a wire. By default, 1e6 protons on one wire gets a
+        # signal of 9.5 V, to roughly match signalConversionConst. Every
+        # charged particle counts the same; neutral ones (photons, neutrons,
+        # neutrinos, see PTMVirtDetReader.neutralPdgIds) count for nothing.
+        self.vdSignalPerHit = 9.5e-6
+        # Settings to sweep over for the signal sweep. None means just use
+        # signalConversionConst / totalSignalErr / no saturation.
+        self.sweepConversionConsts = None
+        self.sweepErrFracs = None
+        self.sweepSaturationThresholds = None
+        # For a quick preview, set this below 1 to read only that fraction of
+        # the files for each ntuple. Histograms get scaled up to the full
+        # data set. Keep sampleSeed the same and raise sampleFraction to 
+        # refine the same preview, up to the full data at 1.
+        self.sampleFraction = 1.0
+        self.sampleSeed = 0
+        # After a preview: the scale for the job (the same for every ntuple,
+        # since they all come from the same sampled files), and the total
+        # and its sampling uncertainty for each scaled hist, by hist name.
+        self.sampleScale = 1.0
+        self.samplingErrors = {}
 
         # internal data
         self.targetFrontChain = None
@@ -96,45 +129,61 @@ class PTMPlotMaker:
         self.PTMSensitiveChain = None
         self.nearPwcVdChain = None
         self.farPwcVdChain = None
+        self.chainAssemblers = {}
+        # ionizing E dep profiles from the last ntPTM scan, shape (4, 48)
+        self.ionizingProfileArray = None
+        self.sweepResults = None
 
-        # histograms we hold onto; by default nothing is in here
-        self.heldHists = {}
+        # histograms we hold onto; by default nothing is in here. Kept per
+        # job, and spilled to heldHists.spillFilePath when they take up more
+        # than heldHists.maxBytes of memory.
+        self.heldHists = HistRegistry()
 
     def verbosePrint(self, printout):
         if self.verbose:
             print(printout)
 
 
+    def _assembleChain(self, ntuplePath):
+        assb = ChainAssembler()
+        assb.jobDirPath = self.dataPath
+        assb.ntuplePath = ntuplePath
+        assb.sampleFraction = self.sampleFraction
+        assb.sampleSeed = self.sampleSeed
+        chain = assb.createChain()
+        self.chainAssemblers[ntuplePath] = assb
+        self.sampleScale = assb.sampleScale
+        self.verbosePrint("Created chain from {0} using {1} data files".format(assb.ntuplePath, len(assb.sampledFilePaths)))
+        if self.sampleFraction < 1.0:
+            self.verbosePrint(assb.samplingSummary())
+        return chain
+
+    def _scaleForSampling(self, hist, ntuplePath):
+        # no-op unless this is a preview of a sample of the data. Integer 
+        # hists come back as scaled double copies, so use the return value.
+        if ntuplePath in self.chainAssemblers and self.sampleFraction < 1.0:
+            assb = self.chainAssemblers[ntuplePath]
+            count = hist.Integral()
+            hist = assb.scaleHist(hist)
+            self.samplingErrors[hist.GetName()] = assb.scaleCount(count)
+            self.verbosePrint("{0}: total {1:.4g} +/- {2:.2g} (sampling)".format(hist.GetName(), *self.samplingErrors[hist.GetName()]))
+        return hist
+
     def gatherChains(self):
         self.verbosePrint("Gathering chains...")
+        self.chainAssemblers = {}
+        self.sampleScale = 1.0
+        self.samplingErrors = {}
+        # profiles from an earlier pass don't go with these chains
+        self.ionizingProfileArray = None
         if self.makeTargetHists:
-            targFAssb = ChainAssembler()
-            targFAssb.jobDirPath = self.dataPath
-            targFAssb.ntuplePath = "readvdPTFront/ntvd"
-            self.targetFrontChain = targFAssb.createChain()
-            self.verbosePrint("Created chain from {0} using {1} data files".format(targFAssb.ntuplePath, len(targFAssb.outFilePaths)))
-            targBAssb = ChainAssembler()
-            targBAssb.jobDirPath = self.dataPath
-            targBAssb.ntuplePath = "readvdPTBack/ntvd"
-            self.targetBackChain = targBAssb.createChain()
-            self.verbosePrint("Created chain from {0} using {1} data files".format(targBAssb.ntuplePath, len(targBAssb.outFilePaths)))
-        if self.makePTMVirtualHists:
-            nearAssb = ChainAssembler()
-            nearAssb.jobDirPath = self.dataPath
-            nearAssb.ntuplePath = "readvdNr/ntvd"
-            self.nearPwcVdChain = nearAssb.createChain()
-            self.verbosePrint("Created chain from {0} using {1} data files".format(nearAssb.ntuplePath, len(nearAssb.outFilePaths)))
-            farAssb = ChainAssembler()
-            farAssb.jobDirPath = self.dataPath
-            farAssb.ntuplePath = "readvdFr/ntvd"
-            self.farPwcVdChain = farAssb.createChain()
-            self.verbosePrint("Created chain from {0} using {1} data files".format(farAssb.ntuplePath, len(farAssb.outFilePaths)))
-        if self.makeScannerPlots:
-            pwcAssb = ChainAssembler()
-            pwcAssb.jobDirPath = self.dataPath
-            pwcAssb.ntuplePath = "readPTM/ntPTM"
-            self.PTMSensitiveChain = pwcAssb.createChain()
-            self.verbosePrint("Created chain from {0} using {1} data files".format(pwcAssb.ntuplePath, len(pwcAssb.outFilePaths)))
+            self.targetFrontChain = self._assembleChain("readvdPTFront/ntvd")
+            self.targetBackChain = self._assembleChain("readvdPTBack/ntvd")
+        if self.makePTMVirtualHists or self.makeVirtualScannerPlots:
+            self.nearPwcVdChain = self._assembleChain("readvdNr/ntvd")
+            self.farPwcVdChain = self._assembleChain("readvdFr/ntvd")
+        if self.makeScannerPlots or self.makeSignalSweep:
+            self.PTMSensitiveChain = self._assembleChain("readPTM/ntPTM")
         self.verbosePrint("...Chains gathered")
 
     def saveTargetHists(self, canvas, cleanupHists=True):
@@ -143,6 +192,7 @@ class PTMPlotMaker:
         # protons incident on the front face of the target
         savename = self.jobName+"_POT.pdf"
         incProtHist = reader.getPositionHist(self.targetFrontChain, name=self.jobName+" POT", trackIDonly=[1], coordTransform=PTMPlotMaker.targetFrontTransform)
+        incProtHist = self._scaleForSampling(incProtHist, "readvdPTFront/ntvd")
         incProtHist.Draw('colz')
         canvas.Print(savename, "pdf")
         canvas.Clear()
@@ -150,6 +200,7 @@ class PTMPlotMaker:
         # primary beam protons that make it through/past the target
         savename = self.jobName+"_prots_out_targ_back.pdf"
         outProtHist = reader.getPositionHist(self.targetBackChain, name=self.jobName+" p+ out target back", trackIDonly=[1], coordTransform=PTMPlotMaker.targetBackTransform)
+        outProtHist = self._scaleForSampling(outProtHist, "readvdPTBack/ntvd")
         outProtHist.Draw('colz')
         canvas.Print(savename, "pdf")
         canvas.Clear()
@@ -157,6 +208,7 @@ class PTMPlotMaker:
         # ALL particles coming off the back of the target
         savename = self.jobName+"_all_out_targ_back.pdf"
         backProtHist = reader.getPositionHist(self.targetBackChain, name=self.jobName+" all out target back", coordTransform=PTMPlotMaker.targetBackTransform)
+        backProtHist = self._scaleForSampling(backProtHist, "readvdPTBack/ntvd")
         backProtHist.Draw('colz')
         canvas.Print(savename, "pdf")
         canvas.Clear()
@@ -167,9 +219,9 @@ class PTMPlotMaker:
             del outProtHist
             del backProtHist
         else:
-            self.heldHists[incProtHist.GetName()] = incProtHist
-            self.heldHists[outProtHist.GetName()] = outProtHist
-            self.heldHists[backProtHist.GetName()] = backProtHist
+            self.heldHists.add(incProtHist.GetName(), incProtHist, self.jobName)
+            self.heldHists.add(outProtHist.GetName(), outProtHist, self.jobName)
+            self.heldHists.add(backProtHist.GetName(), backProtHist, self.jobName)
         self.verbosePrint("Proton target histograms done")
 
     def savePTMVirtualHists(self, canvas, cleanupHists=True):
@@ -178,12 +230,14 @@ class PTMPlotMaker:
         # for each virtual detector, save both the just-primary-proton info and the all-particle info
         savename = self.jobName + "_near_PWC_prots.pdf"
         nearProts = reader.getPositionHist(self.nearPwcVdChain, name=self.jobName+" beam p+ on near PWC", trackIDonly=[1], binsPerSide=100, coordTransform=PTMPlotMaker.ptmVirtDetTransform)
+        nearProts = self._scaleForSampling(nearProts, "readvdNr/ntvd")
         self.verbosePrint("Made hist with name {0}".format(nearProts.GetName()))
         nearProts.Draw('colz')
         canvas.Print(savename, "pdf")
         canvas.Clear()
         savename = self.jobName + "_near_PWC_all.pdf"
         nearAll = reader.getPositionHist(self.nearPwcVdChain, name=self.jobName+" all particles on near PWC", binsPerSide=100, coordTransform=PTMPlotMaker.ptmVirtDetTransform)
+        nearAll = self._scaleForSampling(nearAll, "readvdNr/ntvd")
         nearAll.Draw('colz')
         canvas.Print(savename, "pdf")
         canvas.Clear()
@@ -191,12 +245,14 @@ class PTMPlotMaker:
 
         savename = self.jobName + "_far_PWC_prots.pdf"
         farProts = reader.getPositionHist(self.farPwcVdChain, name=self.jobName+" beam p+ on far PWC", trackIDonly=[1], binsPerSide=100)
+        farProts = self._scaleForSampling(farProts, "readvdFr/ntvd")
         self.verbosePrint("Made hist with name {0}".format(farProts.GetName()))
         farProts.Draw('colz')
         canvas.Print(savename, "pdf")
         canvas.Clear()
         savename = self.jobName + "_far_PWC_all.pdf"
         farAll = reader.getPositionHist(self.farPwcVdChain, name=self.jobName+" all particles on far PWC", binsPerSide=100)
+        farAll = self._scaleForSampling(farAll, "readvdFr/ntvd")
         farAll.Draw('colz')
         canvas.Print(savename, "pdf")
         canvas.Clear()
@@ -208,10 +264,10 @@ class PTMPlotMaker:
             del farProts 
             del farAll
         else:
-            self.heldHists[nearProts.GetName()] = nearProts
-            self.heldHists[nearAll.GetName()] = nearAll
-            self.heldHists[farProts.GetName()] = farProts
-            self.heldHists[farAll.GetName()] = farAll
+            self.heldHists.add(nearProts.GetName(), nearProts, self.jobName)
+            self.heldHists.add(nearAll.GetName(), nearAll, self.jobName)
+            self.heldHists.add(farProts.GetName(), farProts, self.jobName)
+            self.heldHists.add(farAll.GetName(), farAll, self.jobName)
             self.verbosePrint("Keys in heldHists: {0}".format(self.heldHists.keys()))
         self.verbosePrint("PTM histograms done")
 
@@ -219,17 +275,15 @@ class PTMPlotMaker:
 
 
     def addBinErrs(self, hist):
-        binSum = 0.0
-        for i in range(1, hist.GetNbinsX()+1):
-            binVal = hist.GetBinContent(i)
-            binSum += binVal
+        # same error model as ProfileStats, which does this for whole grids
+        # of profiles at once
+        numBins = hist.GetNbinsX()
+        binSum = hist.Integral(1, numBins)
         binErr = self.totalSignalErr * binSum / sqrt(48.0)
         self.verbosePrint("Bin err: {0:.4f} V".format(binErr))
-        binErrSqrSum = 0.0
-        for i in range(1, hist.GetNbinsX()+1):
+        for i in range(1, numBins+1):
             hist.SetBinError(i, binErr)
-            binErrSqrSum += binErr**2
-        binErrTotal = sqrt(binErrSqrSum)
+        binErrTotal = binErr * sqrt(numBins)
         totalErrFrac = binErrTotal / binSum
         self.verbosePrint("Hist sum error frac: {0:.4f}".format(totalErrFrac))
 
@@ -237,6 +291,10 @@ class PTMPlotMaker:
         self.verbosePrint("Making and saving scanner plots")
         reader = PTMDetectorReader()
         ionizingProfiles = reader.getIonizingProfiles(self.PTMSensitiveChain, self.jobName+"PTM_ionizing_")
+        for plane in ionizingProfiles:
+            ionizingProfiles[plane] = self._scaleForSampling(ionizingProfiles[plane], "readPTM/ntPTM")
+        # keep the raw profiles so a signal sweep doesn't need another scan
+        self.ionizingProfileArray = ProfileStats().histsToArray([ionizingProfiles])[0]
         # Make the titles look nicer, and save the ionizing e dep data
         horizIon1 = ionizingProfiles["horiz1"]
         horizIon1.SetTitle("PTM PWC #1 horizontal: ionizing E dep")
@@ -312,16 +370,109 @@ class PTMPlotMaker:
             del vertSig1
             del vertSig2
         else:
-            self.heldHists[horizIon1.GetName()] = horizIon1
-            self.heldHists[horizIon2.GetName()] = horizIon2
-            self.heldHists[vertIon1.GetName()] = vertIon1
-            self.heldHists[vertIon2.GetName()] = vertIon2
-            self.heldHists[horizSig1.GetName()] = horizSig1
-            self.heldHists[horizSig2.GetName()] = horizSig2
-            self.heldHists[vertSig1.GetName()] = vertSig1
-            self.heldHists[vertSig2.GetName()] = vertSig2
+            self.heldHists.add(horizIon1.GetName(), horizIon1, self.jobName)
+            self.heldHists.add(horizIon2.GetName(), horizIon2, self.jobName)
+            self.heldHists.add(vertIon1.GetName(), vertIon1, self.jobName)
+            self.heldHists.add(vertIon2.GetName(), vertIon2, self.jobName)
+            self.heldHists.add(horizSig1.GetName(), horizSig1, self.jobName)
+            self.heldHists.add(horizSig2.GetName(), horizSig2, self.jobName)
+            self.heldHists.add(vertSig1.GetName(), vertSig1, self.jobName)
+            self.heldHists.add(vertSig2.GetName(), vertSig2, self.jobName)
         self.verbosePrint("All PWC scanner plots done")
 
+    def saveVirtualScannerPlots(self, canvas, cleanupHists=True):
+        # Approximate scanner signals from the PTM virtual detectors, which 
+        # are much cheaper to simulate than the PWC sensitive detectors. 
+        self.verbosePrint("Making and saving virtual detector scanner plots")
+        reader = PTMVirtDetReader()
+        # same coordinate handling as savePTMVirtualHists
+        nearProfiles = reader.getWireProfiles(self.nearPwcVdChain, self.jobName+"PTM_vdHits_near_", coordTransform=PTMPlotMaker.ptmVirtDetTransform)
+        farProfiles = reader.getWireProfiles(self.farPwcVdChain, self.jobName+"PTM_vdHits_far_")
+        for plane in nearProfiles:
+            nearProfiles[plane] = self._scaleForSampling(nearProfiles[plane], "readvdNr/ntvd")
+        for plane in farProfiles:
+            farProfiles[plane] = self._scaleForSampling(farProfiles[plane], "readvdFr/ntvd")
+        self.verbosePrint("Virtual detector wire profiles done")
+
+        horizSig1 = nearProfiles["horiz"]
+        horizSig1.Scale(self.vdSignalPerHit)
+        self.addBinErrs(horizSig1)
+        horizSig1.SetName(self.jobName+"_vdHorizSignal_1")
+        horizSig1.GetYaxis().SetTitle("scanner signal (V)")
+        horizSig1.SetTitle("PTM PWC #1 horizontal: scanner signal from virtual detector")
+        horizSig1.Draw("hist e1")
+        canvas.Print(horizSig1.GetName()+".pdf", "pdf")
+        canvas.Clear()
+
+        horizSig2 = farProfiles["horiz"]
+        horizSig2.Scale(self.vdSignalPerHit)
+        self.addBinErrs(horizSig2)
+        horizSig2.SetName(self.jobName+"_vdHorizSignal_2")
+        horizSig2.GetYaxis().SetTitle("scanner signal (V)")
+        horizSig2.SetTitle("PTM PWC #2 horizontal: scanner signal from virtual detector")
+        horizSig2.Draw("hist e1")
+        canvas.Print(horizSig2.GetName()+".pdf", "pdf")
+        canvas.Clear()
+
+        vertSig1 = nearProfiles["vert"]
+        vertSig1.Scale(self.vdSignalPerHit)
+        self.addBinErrs(vertSig1)
+        vertSig1.SetName(self.jobName+"_vdVertSignal_1")
+        vertSig1.GetYaxis().SetTitle("scanner signal (V)")
+        vertSig1.SetTitle("PTM PWC #1 vertical: scanner signal from virtual detector")
+        vertSig1.Draw("hist e1")
+        canvas.Print(vertSig1.GetName()+".pdf", "pdf")
+        canvas.Clear()
+
+        vertSig2 = farProfiles["vert"]
+        vertSig2.Scale(self.vdSignalPerHit)
+        self.addBinErrs(vertSig2)
+        vertSig2.SetName(self.jobName+"_vdVertSignal_2")
+        vertSig2.GetYaxis().SetTitle("scanner signal (V)")
+        vertSig2.SetTitle("PTM PWC #2 vertical: scanner signal from virtual detector")
+        vertSig2.Draw("hist e1")
+        canvas.Print(vertSig2.GetName()+".pdf", "pdf")
+        canvas.Clear()
+
+        # cleanup
+        if cleanupHists:
+            del horizSig1
+            del horizSig2
+            del vertSig1
+            del vertSig2
+        else:
+            self.heldHists.add(horizSig1.GetName(), horizSig1, self.jobName)
+            self.heldHists.add(horizSig2.GetName(), horizSig2, self.jobName)
+            self.heldHists.add(vertSig1.GetName(), vertSig1, self.jobName)
+            self.heldHists.add(vertSig2.GetName(), vertSig2, self.jobName)
+        self.verbosePrint("All virtual detector scanner plots done")
+
+    def runSignalSweep(self):
+        # Scanner signals for a whole grid of signal model settings (like 
+        # different bias voltages) from one set of ionizing profiles. 
+        # Results are kept in sweepResults and saved together in one file.
+        self.verbosePrint("Running signal sweep")
+        if self.ionizingProfileArray is None:
+            reader = PTMDetectorReader()
+            ionizingProfiles = reader.getIonizingProfiles(self.PTMSensitiveChain, self.jobName+"PTM_ionizing_sweep_")
+            for plane in ionizingProfiles:
+                ionizingProfiles[plane] = self._scaleForSampling(ionizingProfiles[plane], "readPTM/ntPTM")
+            self.ionizingProfileArray = ProfileStats().histsToArray([ionizingProfiles])[0]
+            del ionizingProfiles
+        conversionConsts = self.sweepConversionConsts
+        if conversionConsts is None:
+            conversionConsts = [self.signalConversionConst]
+        errFracs = self.sweepErrFracs
+        if errFracs is None:
+            errFracs = [self.totalSignalErr]
+        stats = ProfileStats(self.totalSignalErr)
+        self.sweepResults = stats.signalSweep(self.ionizingProfileArray, conversionConsts, errFracs, self.sweepSaturationThresholds)
+        self.sweepResults["planes"] = np.array(stats.planes)
+        self.sweepResults["wirePositions"] = stats.wirePositions
+        savename = self.jobName+"_signalSweep.npz"
+        np.savez(savename, **self.sweepResults)
+        self.verbosePrint("Signal sweep over {0} settings saved to {1}".format(self.sweepResults["binErr"].shape[:3], savename))
+
     def makeAllPlots(self):
         self.verbosePrint("About to make all plots for job {0}".format(self.jobName))
         self.gatherChains()
@@ -332,14 +483,21 @@ class PTMPlotMaker:
             self.savePTMVirtualHists(canvas, cleanupHists=self.cleanupHists)
         if self.makeScannerPlots:
             self.saveScannerPlots(canvas, cleanupHists=self.cleanupHists)
+        if self.makeVirtualScannerPlots:
+            self.saveVirtualScannerPlots(canvas, cleanupHists=self.cleanupHists)
+        if self.makeSignalSweep:
+            self.runSignalSweep()
         self.verbosePrint("Finished all plots for job {0}".format(self.jobName))
 
-    def redrawPlots(self, canvas, gpopt=None):
-        if self.heldHists is None or len(self.heldHists) == 0:
+    def redrawPlots(self, canvas, gpopt=None, jobName=None):
+        # jobName picks which job's held hists to redraw; by default, the 
+        # most recent one. Spilled hists get read back in as needed.
+        heldNames = self.heldHists.keys(jobName)
+        if len(heldNames) == 0:
             print("No held hists to re-save")
         else:
-            for k in self.heldHists.keys():
-                theHist = self.heldHists[k]
+            for k in heldNames:
+                theHist = self.heldHists.get(k, jobName)
                 if gpopt is None:
                     theHist.Draw()
                 else:
@@ -348,7 +506,9 @@ class PTMPlotMaker:
                 canvas.Clear()
             self.verbosePrint("Re-saved all held hists")
 
-    def clearData(self):
+    def clearData(self, keepHists=False):
+        # With keepHists, held hists stay available by job name (for 
+        # working through a grid); heldHists.removeJob releases one job.
         self.verbosePrint("Clearing internal data so this instance can be used again")
         self.dataPath = None
         self.jobName = None
@@ -359,9 +519,19 @@ class PTMPlotMaker:
         self.PTMSensitiveChain = None
         self.nearPwcVdChain = None
         self.farPwcVdChain = None
-
-        # histograms we hold onto; by default nothing is in here
-        self.heldHists = {}
+        self.chainAssemblers = {}
+        self.sampleScale = 1.0
+        self.samplingErrors = {}
+        self.ionizingProfileArray = None
+        self.sweepResults = None
+
+        # histograms we hold onto. If kept, indexing heldHists gives nothing
+        # until the next job adds some.
+        if keepHists:
+            self.heldHists.currentJob = None
+        else:
+            self.heldHists.clear()
+            self.heldHists.currentJob = None
 
 
 
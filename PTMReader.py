@@ -2,8 +2,54 @@
 from ROOT import TH1F, TH1I, TH2I, TH2F
 from array import array
 from math import sqrt, pi
+import numpy as np
 
-class PTMDetectorReader:
+class PdgGroupReader:
+    """ Shared helpers for breaking histograms down by PDG id. Readers that 
+    take groupByPdg put each particle in the group for its PDG id, or in
+    "other" if it's not in groupByPdg, and everything in "total". With no 
+    groupByPdg, everything goes in "total" only. """
+
+    def _pdgGroup(self, pdg, groupByPdg):
+        if len(groupByPdg) == 0:
+            return "total"
+        if pdg in groupByPdg:
+            return pdg
+        return "other"
+
+    def _pdgGroupKeys(self, groupByPdg):
+        if len(groupByPdg) == 0:
+            return ["total"]
+        return list(groupByPdg) + ["other", "total"]
+
+    def _fillTotal(self, valsByGroup):
+        # valsByGroup is like {2212: array, "other": array, "total": array}
+        for group in valsByGroup:
+            if group != "total":
+                valsByGroup["total"].extend(valsByGroup[group])
+
+    def _groupLabel(self, group):
+        if group == "other" or group == "total":
+            return group
+        return "pdg{0}".format(group)
+
+    def _groupName(self, name, group, groupByPdg):
+        if len(groupByPdg) == 0:
+            return name
+        return name+" "+self._groupLabel(group)
+
+    def _groupNamebase(self, namebase, group, groupByPdg):
+        if len(groupByPdg) == 0:
+            return namebase
+        return namebase+self._groupLabel(group)+"_"
+
+    def _groupResult(self, outByGroup, groupByPdg):
+        # just the thing itself, unless we're breaking down by PDG id
+        if len(groupByPdg) == 0:
+            return outByGroup["total"]
+        return outByGroup
+
+class PTMDetectorReader(PdgGroupReader):
     """ This is for making histograms from the PTM gas volume sensitive 
     detectors. """
 
@@ -14,104 +60,91 @@ class PTMDetectorReader:
         self.horiz2_volIds = [144, 191]
 
     def _volIdToPosition(self, volId):
+        # The 48 wires on a plane are 2 mm apart, centred on the beam axis,
+        # so they sit at -47..47 mm: the bin centres of the profile hists.
         numOnPlane = volId % 48
         centered = numOnPlane - 24
-        scaledPosition = centered * 2
+        scaledPosition = centered * 2 + 1
         return scaledPosition
 
+    def _volIdToPlane(self, volId):
+        if volId >= self.vert1_volIds[0] and volId <= self.vert1_volIds[1]:
+            return "vert1"
+        elif volId >= self.vert2_volIds[0] and volId <= self.vert2_volIds[1]:
+            return "vert2"
+        elif volId >= self.horiz1_volIds[0] and volId <= self.horiz1_volIds[1]:
+            return "horiz1"
+        elif volId >= self.horiz2_volIds[0] and volId <= self.horiz2_volIds[1]:
+            return "horiz2"
+        return None
+
     def _makeUniqueParticleId(self, eventId, trackId, pdgId, fnum):
         return "{0}_{1}_{2}_{3}".format(eventId, trackId, pdgId, fnum)
 
-    def getIonizingProfiles(self, chain, namebase, pdgIDonly=[]):
-        horizHits_1 = array('d', [])
-        horizWeights_1 = array('d', [])
-        vertHits_1 = array('d', [])
-        vertWeights_1 = array('d', [])
-        horizHits_2 = array('d', [])
-        horizWeights_2 = array('d', [])
-        vertHits_2 = array('d', [])
-        vertWeights_2 = array('d', [])
+    def _collectProfileHits(self, chain, pdgIDonly, groupByPdg):
+        # wire positions and ionizing E deps on each plane, for each PDG 
+        # group, from one read of the chain
+        hits = {}
+        weights = {}
+        for group in self._pdgGroupKeys(groupByPdg):
+            hits[group] = {"horiz1": array('d', []), "horiz2": array('d', []), "vert1": array('d', []), "vert2": array('d', [])}
+            weights[group] = {"horiz1": array('d', []), "horiz2": array('d', []), "vert1": array('d', []), "vert2": array('d', [])}
         for entry in chain:
             if len(pdgIDonly) == 0 or entry.pdg in pdgIDonly:
-                spatialPosition = self._volIdToPosition(entry.volId)
-                iEdep = entry.iedep
-                if entry.volId >= self.vert1_volIds[0] and entry.volId <= self.vert1_volIds[1]:
-                    vertHits_1.append(spatialPosition)
-                    vertWeights_1.append(iEdep)
-                elif entry.volId >= self.vert2_volIds[0] and entry.volId <= self.vert2_volIds[1]:
-                    vertHits_2.append(spatialPosition)
-                    vertWeights_2.append(iEdep)
-                elif entry.volId >= self.horiz1_volIds[0] and entry.volId <= self.horiz1_volIds[1]:
-                    horizHits_1.append(spatialPosition)
-                    horizWeights_1.append(iEdep)
-                elif entry.volId >= self.horiz2_volIds[0] and entry.volId <= self.horiz2_volIds[1]:
-                    horizHits_2.append(spatialPosition)
-                    horizWeights_2.append(iEdep)
-        horiz1 = TH1F(namebase+"horiz1", namebase+"horiz1", 48, -48, 48)
-        horiz1.FillN(len(horizHits_1), horizHits_1, horizWeights_1, 1)
-        horiz1.GetXaxis().SetTitle("horiz position (mm)")
-        horiz1.GetYaxis().SetTitle("ionizing E dep (MeV)")
-        horiz2 = TH1F(namebase+"horiz2", namebase+"horiz2", 48, -48, 48)
-        horiz2.FillN(len(horizHits_2), horizHits_2, horizWeights_2, 1)
-        horiz2.GetXaxis().SetTitle("horiz position (mm)")
-        horiz2.GetYaxis().SetTitle("ionizing E dep (MeV)")
-        vert1 = TH1F(namebase+"vert1", namebase+"vert1", 48, -48, 48)
-        vert1.FillN(len(vertHits_1), vertHits_1, vertWeights_1, 1)
-        vert1.GetXaxis().SetTitle("vert position (mm)")
-        vert1.GetYaxis().SetTitle("ionizing E dep (MeV)")
-        vert2 = TH1F(namebase+"vert2", namebase+"vert2", 48, -48, 48)
-        vert2.FillN(len(vertHits_2), vertHits_2, vertWeights_2, 1)
-        vert2.GetXaxis().SetTitle("vert position (mm)")
-        vert2.GetYaxis().SetTitle("ionizing E dep (MeV)")
-
-        outDict = {"horiz1": horiz1, "horiz2": horiz2, "vert1": vert1, "vert2": vert2}
+                plane = self._volIdToPlane(entry.volId)
+                if plane is not None:
+                    group = self._pdgGroup(entry.pdg, groupByPdg)
+                    hits[group][plane].append(self._volIdToPosition(entry.volId))
+                    weights[group][plane].append(entry.iedep)
+        for plane in hits["total"]:
+            self._fillTotal(dict((group, hits[group][plane]) for group in hits))
+            self._fillTotal(dict((group, weights[group][plane]) for group in weights))
+        return hits, weights
+
+    def _makeProfiles(self, namebase, hits, weights, yTitle):
+        outDict = {}
+        for plane in ["horiz1", "horiz2", "vert1", "vert2"]:
+            hist = TH1F(namebase+plane, namebase+plane, 48, -48, 48)
+            hist.FillN(len(hits[plane]), hits[plane], weights[plane], 1)
+            hist.GetXaxis().SetTitle(plane[:-1]+" position (mm)")
+            hist.GetYaxis().SetTitle(yTitle)
+            outDict[plane] = hist
         return outDict
 
+    def getIonizingProfiles(self, chain, namebase, pdgIDonly=[], groupByPdg=[]):
+        # If groupByPdg is given, returns a dict of profile dicts keyed by 
+        # PDG id, plus "other" and "total", all from one read of the chain.
+        hits, weights = self._collectProfileHits(chain, pdgIDonly, groupByPdg)
+        outByGroup = {}
+        for group in hits:
+            groupNamebase = self._groupNamebase(namebase, group, groupByPdg)
+            outByGroup[group] = self._makeProfiles(groupNamebase, hits[group], weights[group], "ionizing E dep (MeV)")
+        return self._groupResult(outByGroup, groupByPdg)
 
-    def getHitCountProfiles(self, chain, namebase, pdgIDonly=[]):
-        horizHits_1 = array('d', [])
-        vertHits_1 = array('d', [])
-        horizHits_2 = array('d', [])
-        vertHits_2 = array('d', [])
-        for entry in chain:
-            if len(pdgIDonly) == 0 or entry.pdg in pdgIDonly:
-                spatialPosition = self._volIdToPosition(entry.volId)
-                iEdep = entry.iedep
-                if entry.volId >= self.vert1_volIds[0] and entry.volId <= self.vert1_volIds[1]:
-                    vertHits_1.append(spatialPosition)
-                elif entry.volId >= self.vert2_volIds[0] and entry.volId <= self.vert2_volIds[1]:
-                    vertHits_2.append(spatialPosition)
-                elif entry.volId >= self.horiz1_volIds[0] and entry.volId <= self.horiz1_volIds[1]:
-                    horizHits_1.append(spatialPosition)
-                elif entry.volId >= self.horiz2_volIds[0] and entry.volId <= self.horiz2_volIds[1]:
-                    horizHits_2.append(spatialPosition)
-        horiz1 = TH1F(namebase+"horiz1", namebase+"horiz1", 48, -48, 48)
-        horiz1.FillN(len(horizHits_1), horizHits_1, array('d', [1 for i in horizHits_1]), 1)
-        horiz1.GetXaxis().SetTitle("horiz position (mm)")
-        horiz1.GetYaxis().SetTitle("ionizing E dep (MeV)")
-        horiz2 = TH1F(namebase+"horiz2", namebase+"horiz2", 48, -48, 48)
-        horiz2.FillN(len(horizHits_2), horizHits_2, array('d', [1 for i in horizHits_2]), 1)
-        horiz2.GetXaxis().SetTitle("horiz position (mm)")
-        horiz2.GetYaxis().SetTitle("ionizing E dep (MeV)")
-        vert1 = TH1F(namebase+"vert1", namebase+"vert1", 48, -48, 48)
-        vert1.FillN(len(vertHits_1), vertHits_1, array('d', [1 for i in vertHits_1]), 1)
-        vert1.GetXaxis().SetTitle("vert position (mm)")
-        vert1.GetYaxis().SetTitle("ionizing E dep (MeV)")
-        vert2 = TH1F(namebase+"vert2", namebase+"vert2", 48, -48, 48)
-        vert2.FillN(len(vertHits_2), vertHits_2, array('d', [1 for i in vertHits_2]), 1)
-        vert2.GetXaxis().SetTitle("vert position (mm)")
-        vert2.GetYaxis().SetTitle("ionizing E dep (MeV)")
-
-        outDict = {"horiz1": horiz1, "horiz2": horiz2, "vert1": vert1, "vert2": vert2}
-        return outDict
+    def getHitCountProfiles(self, chain, namebase, pdgIDonly=[], groupByPdg=[]):
+        # If groupByPdg is given, returns a dict of profile dicts keyed by 
+        # PDG id, plus "other" and "total", all from one read of the chain.
+        hits, weights = self._collectProfileHits(chain, pdgIDonly, groupByPdg)
+        outByGroup = {}
+        for group in hits:
+            ones = {}
+            for plane in hits[group]:
+                ones[plane] = array('d', [1 for i in hits[group][plane]])
+            groupNamebase = self._groupNamebase(namebase, group, groupByPdg)
+            outByGroup[group] = self._makeProfiles(groupNamebase, hits[group], ones, "ionizing E dep (MeV)")
+        return self._groupResult(outByGroup, groupByPdg)
 
-    def getIonizingEDepHist(self, chain, volIds, name=None, pdgIDonly=[], numBins=100, maxVal=None):
+    def getIonizingEDepHist(self, chain, volIds, name=None, pdgIDonly=[], numBins=100, maxVal=None, groupByPdg=[]):
+        # If groupByPdg is given, returns a dict of hists keyed by PDG id,
+        # plus "other" and "total", all from one read of the chain.
         if name is None:
             name = "Ionizing E Dep"
             if len(pdgIDonly) > 0:
                 name += " for pdgIds: {0}".format(pdgIDonly)
         checkValues = False
         totalIEdeps = {}
+        for group in self._pdgGroupKeys(groupByPdg):
+            totalIEdeps[group] = {}
         fnum = 1
         fpt = chain.GetFile()
         for entry in chain:
@@ -124,10 +157,11 @@ class PTMDetectorReader:
             if len(pdgIDonly) == 0 or entry.pdg in pdgIDonly:
                 uniqueId = self._makeUniqueParticleId(entry.evt, entry.trk, entry.pdg, fnum)
                 thisEdep = entry.iedep 
-                if uniqueId in totalIEdeps:
-                    totalIEdeps[uniqueId] += thisEdep
+                groupIEdeps = totalIEdeps[self._pdgGroup(entry.pdg, groupByPdg)]
+                if uniqueId in groupIEdeps:
+                    groupIEdeps[uniqueId] += thisEdep
                 else:
-                    totalIEdeps[uniqueId] = thisEdep
+                    groupIEdeps[uniqueId] = thisEdep
 
         # if minVal is not None or maxVal is not None:
         #     checkValues = True
@@ -139,15 +173,22 @@ class PTMDetectorReader:
         #         if u >= minVal and u <= maxVal:
         #             allEdeps.append(u)
         # else: allEdeps = totalIEdeps.values()
-        allEdeps = array('d', totalIEdeps.values())
-        theMax = max(allEdeps) if maxVal is None else maxVal
-        edepHist = TH1I(name, name, numBins, 0.0, maxVal)
-        edepHist.FillN(len(allEdeps), allEdeps, array('d', [1 for i in allEdeps]), 1)
-        edepHist.GetXaxis().SetTitle("ionizing E dep (MeV)")
-        edepHist.GetYaxis().SetTitle("count")
-        return edepHist
-
-class VirtDetReader:
+        allEdeps = {}
+        for group in totalIEdeps:
+            allEdeps[group] = array('d', totalIEdeps[group].values())
+        self._fillTotal(allEdeps)
+        theMax = max(allEdeps["total"]) if maxVal is None else maxVal
+        outByGroup = {}
+        for group in allEdeps:
+            groupName = self._groupName(name, group, groupByPdg)
+            edepHist = TH1I(groupName, groupName, numBins, 0.0, theMax)
+            edepHist.FillN(len(allEdeps[group]), allEdeps[group], array('d', [1 for i in allEdeps[group]]), 1)
+            edepHist.GetXaxis().SetTitle("ionizing E dep (MeV)")
+            edepHist.GetYaxis().SetTitle("count")
+            outByGroup[group] = edepHist
+        return self._groupResult(outByGroup, groupByPdg)
+
+class VirtDetReader(PdgGroupReader):
     """ This is for making histograms from virtual detectors. """
 
     def _getXEnds(self, xvals):
@@ -162,13 +203,18 @@ class VirtDetReader:
         ymax = max(yvals) + 0.025*yRange
         return ymin, ymax
 
-    def getPositionHist(self, chain, name=None, pdgIDonly=[], trackIDonly=[], binsPerSide=100, coordTransform=None):
+    def getPositionHist(self, chain, name=None, pdgIDonly=[], trackIDonly=[], binsPerSide=100, coordTransform=None, groupByPdg=[]):
+        # If groupByPdg is given, returns a dict of hists keyed by PDG id,
+        # plus "other" and "total", all from one read of the chain.
         if name is None:
             name = "Virtual Detector Hit Positions"
             if len(pdgIDonly) > 0:
                 name += " for pdgIds: {0}".format(pdgIDonly)
-        xvals = array('d', [])
-        yvals = array('d', [])
+        xvals = {}
+        yvals = {}
+        for group in self._pdgGroupKeys(groupByPdg):
+            xvals[group] = array('d', [])
+            yvals[group] = array('d', [])
         for entry in chain:
             if (len(pdgIDonly) == 0 or entry.pdg in pdgIDonly) and (len(trackIDonly) == 0 or entry.trk in trackIDonly):
                 x = entry.xl
@@ -176,24 +222,38 @@ class VirtDetReader:
                 z = entry.zl
                 if coordTransform is not None:
                     x, y, z = coordTransform(x, y, z)
-                xvals.append(x)
-                yvals.append(y)
-        xmin, xmax = self._getXEnds(xvals)
-        ymin, ymax = self._getYEnds(yvals)
-        hitHist = TH2I(name, name, binsPerSide, xmin, xmax, binsPerSide, ymin, ymax)
-        hitHist.FillN(len(xvals), xvals, yvals, array('d', [1 for i in xvals]), 1)
-        hitHist.GetXaxis().SetTitle("x position (mm)")
-        hitHist.GetYaxis().SetTitle("y position (mm)")
-        return hitHist
-
-    def getKEWieghtedPositionHist(self, chain, name=None, pdgIDonly=[], binsPerSide=100, coordTransform=None):
+                group = self._pdgGroup(entry.pdg, groupByPdg)
+                xvals[group].append(x)
+                yvals[group].append(y)
+        self._fillTotal(xvals)
+        self._fillTotal(yvals)
+        # same ranges for every group, so they're easy to compare
+        xmin, xmax = self._getXEnds(xvals["total"])
+        ymin, ymax = self._getYEnds(yvals["total"])
+        outByGroup = {}
+        for group in xvals:
+            groupName = self._groupName(name, group, groupByPdg)
+            hitHist = TH2I(groupName, groupName, binsPerSide, xmin, xmax, binsPerSide, ymin, ymax)
+            hitHist.FillN(len(xvals[group]), xvals[group], yvals[group], array('d', [1 for i in xvals[group]]), 1)
+            hitHist.GetXaxis().SetTitle("x position (mm)")
+            hitHist.GetYaxis().SetTitle("y position (mm)")
+            outByGroup[group] = hitHist
+        return self._groupResult(outByGroup, groupByPdg)
+
+    def getKEWieghtedPositionHist(self, chain, name=None, pdgIDonly=[], binsPerSide=100, coordTransform=None, groupByPdg=[]):
+        # If groupByPdg is given, returns a dict of hists keyed by PDG id,
+        # plus "other" and "total", all from one read of the chain.
         if name is None:
             name = "Virtual Detector KE-Weighted Hit Positions"
             if len(pdgIDonly) > 0:
                 name += " for pdgIds: {0}".format(pdgIDonly)
-        xvals = array('d', [])
-        yvals = array('d', [])
-        kes = array('d', [])
+        xvals = {}
+        yvals = {}
+        kes = {}
+        for group in self._pdgGroupKeys(groupByPdg):
+            xvals[group] = array('d', [])
+            yvals[group] = array('d', [])
+            kes[group] = array('d', [])
         for entry in chain:
             if len(pdgIDonly) == 0 or entry.pdg in pdgIDonly:
                 x = entry.xl
@@ -201,38 +261,62 @@ class VirtDetReader:
                 z = entry.zl
                 if coordTransform is not None:
                     x, y, z = coordTransform(x, y, z)
-                xvals.append(x)
-                yvals.append(y)
-                kes.append(entry.ke)
-        xmin, xmax = self._getXEnds(xvals)
-        ymin, ymax = self._getYEnds(yvals)
-        hitHist = TH2F(name, name, binsPerSide, xmin, xmax, binsPerSide, ymin, ymax)
-        hitHist.FillN(len(xvals), xvals, yvals, kes, 1)
-        hitHist.GetXaxis().SetTitle("x position (mm)")
-        hitHist.GetYaxis().SetTitle("y position (mm)")
-        return hitHist
-
-    def getIncidentKEHist(self, chain, name=None, pdgIDonly=[], numBins=100):
+                group = self._pdgGroup(entry.pdg, groupByPdg)
+                xvals[group].append(x)
+                yvals[group].append(y)
+                kes[group].append(entry.ke)
+        self._fillTotal(xvals)
+        self._fillTotal(yvals)
+        self._fillTotal(kes)
+        xmin, xmax = self._getXEnds(xvals["total"])
+        ymin, ymax = self._getYEnds(yvals["total"])
+        outByGroup = {}
+        for group in xvals:
+            groupName = self._groupName(name, group, groupByPdg)
+            hitHist = TH2F(groupName, groupName, binsPerSide, xmin, xmax, binsPerSide, ymin, ymax)
+            hitHist.FillN(len(xvals[group]), xvals[group], yvals[group], kes[group], 1)
+            hitHist.GetXaxis().SetTitle("x position (mm)")
+            hitHist.GetYaxis().SetTitle("y position (mm)")
+            outByGroup[group] = hitHist
+        return self._groupResult(outByGroup, groupByPdg)
+
+    def getIncidentKEHist(self, chain, name=None, pdgIDonly=[], numBins=100, groupByPdg=[]):
+        # If groupByPdg is given, returns a dict of hists keyed by PDG id,
+        # plus "other" and "total", all from one read of the chain.
         if name is None:
             name = "Virtual Detector Incident Kinetic Energy"
             if len(pdgIDonly) > 0:
                 name += " for pdgIds: {0}".format(pdgIDonly)
-        kes = array('d', [])
+        kes = {}
+        for group in self._pdgGroupKeys(groupByPdg):
+            kes[group] = array('d', [])
         for entry in chain:
             if len(pdgIDonly) == 0 or entry.pdg in pdgIDonly:
-                kes.append(entry.ke)
-        keHist = TH1I(name, name, numBins, 0.0, max(kes))
-        keHist.FillN(len(kes), kes, array('d', [1 for i in kes]), 1)
-        keHist.GetXaxis().SetTitle("incident KE (MeV)")
-        keHist.GetYaxis().SetTitle("count")
-        return keHist
-
-    def getTotalParticleCount(self, chain, pdgIDonly=[]):
-        totalCount = 0
+                kes[self._pdgGroup(entry.pdg, groupByPdg)].append(entry.ke)
+        self._fillTotal(kes)
+        maxKE = max(kes["total"])
+        outByGroup = {}
+        for group in kes:
+            groupName = self._groupName(name, group, groupByPdg)
+            keHist = TH1I(groupName, groupName, numBins, 0.0, maxKE)
+            keHist.FillN(len(kes[group]), kes[group], array('d', [1 for i in kes[group]]), 1)
+            keHist.GetXaxis().SetTitle("incident KE (MeV)")
+            keHist.GetYaxis().SetTitle("count")
+            outByGroup[group] = keHist
+        return self._groupResult(outByGroup, groupByPdg)
+
+    def getTotalParticleCount(self, chain, pdgIDonly=[], groupByPdg=[]):
+        # If groupByPdg is given, returns a dict of counts keyed by PDG id,
+        # plus "other" and "total".
+        counts = {}
+        for group in self._pdgGroupKeys(groupByPdg):
+            counts[group] = 0
         for entry in chain:
             if len(pdgIDonly) == 0 or entry.pdg in pdgIDonly:
-                totalCount += 1
-        return totalCount
+                counts[self._pdgGroup(entry.pdg, groupByPdg)] += 1
+        if len(groupByPdg) > 0:
+            counts["total"] = sum(counts.values())
+        return self._groupResult(counts, groupByPdg)
 
     def getParticlesAccounting(self, chain):
         # returns a dict where the keys are PDGids and the values contain 
@@ -268,8 +352,90 @@ class VirtDetReader:
 
 
 class PTMVirtDetReader(VirtDetReader):
+    """ This is for making histograms from the virtual detectors in front of
+    the PTM PWCs (readvdNr and readvdFr). Can also digitize the hits onto the
+    PWC wire planes, to get approximate scanner profiles without running the
+    sensitive detector simulation. """
+
+    def __init__(self):
+        # same wire positions as PTMDetectorReader._volIdToPosition gives
+        self.wirePositions = array('d', [(i - 24) * 2 + 1 for i in range(48)])
+        # neutral particles leave no ionization in the PWC gas: photons,
+        # neutrinos, neutrons, neutral pions and kaons, lambdas
+        self.neutralPdgIds = [22, 12, -12, 14, -14, 16, -16, 2112, -2112, 111, 130, 310, 311, -311, 3122, -3122]
+
     def _getXEnds(self, xvals):
         return -48, 48
 
     def _getYEnds(self, yvals):
         return -48, 48
+
+    @staticmethod
+    def getClosestWires(positions, wirePositions):
+        # Array version of PTMPlotMaker.getClosestWire: returns the index of
+        # the closest wire for every position at once. wirePositions must be
+        # sorted. Positions off the ends of the plane go to the end wires.
+        positions = np.asarray(positions, dtype=np.float64)
+        wires = np.asarray(wirePositions, dtype=np.float64)
+        after = np.clip(np.searchsorted(wires, positions, side='left'), 1, len(wires)-1)
+        before = after - 1
+        beforeGap = np.abs(positions - wires[before])
+        afterGap = np.abs(wires[after] - positions)
+        return np.where(beforeGap < afterGap, before, after)
+
+    def _makeWireProfiles(self, namebase, horizHits, vertHits):
+        weights = np.ones(len(horizHits), dtype=np.float64)
+        horiz = TH1F(namebase+"horiz", namebase+"horiz", 48, -48, 48)
+        horiz.FillN(len(horizHits), horizHits, weights, 1)
+        horiz.GetXaxis().SetTitle("horiz position (mm)")
+        horiz.GetYaxis().SetTitle("hits")
+        vert = TH1F(namebase+"vert", namebase+"vert", 48, -48, 48)
+        vert.FillN(len(vertHits), vertHits, weights, 1)
+        vert.GetXaxis().SetTitle("vert position (mm)")
+        vert.GetYaxis().SetTitle("hits")
+
+        outDict = {"horiz": horiz, "vert": vert}
+        return outDict
+
+    def getWireProfiles(self, chain, namebase, pdgIDonly=[], trackIDonly=[], coordTransform=None, groupByPdg=[], chargedOnly=True):
+        # Each hit counts once on the closest horizontal wire (by x) and the
+        # closest vertical wire (by y). Hits more than half a wire spacing 
+        # past the outermost wires (|x| or |y| > 48 mm) miss the PWC entirely.
+        # With chargedOnly, particles in neutralPdgIds are left out, since 
+        # they wouldn't make any signal.
+        # If groupByPdg is given, returns a dict of profile dicts keyed by 
+        # PDG id, plus "other" and "total", all from one read of the chain.
+        xvals = {}
+        yvals = {}
+        for group in self._pdgGroupKeys(groupByPdg):
+            xvals[group] = array('d', [])
+            yvals[group] = array('d', [])
+        for entry in chain:
+            if chargedOnly and entry.pdg in self.neutralPdgIds:
+                continue
+            if (len(pdgIDonly) == 0 or entry.pdg in pdgIDonly) and (len(trackIDonly) == 0 or entry.trk in trackIDonly):
+                x = entry.xl
+                y = entry.yl 
+                z = entry.zl
+                if coordTransform is not None:
+                    x, y, z = coordTransform(x, y, z)
+                group = self._pdgGroup(entry.pdg, groupByPdg)
+                xvals[group].append(x)
+                yvals[group].append(y)
+        self._fillTotal(xvals)
+        self._fillTotal(yvals)
+
+        wires = np.asarray(self.wirePositions, dtype=np.float64)
+        halfSpacing = 0.5 * (wires[1] - wires[0])
+        low = wires[0] - halfSpacing
+        high = wires[-1] + halfSpacing
+        outByGroup = {}
+        for group in xvals:
+            xs = np.asarray(xvals[group], dtype=np.float64)
+            ys = np.asarray(yvals[group], dtype=np.float64)
+            onPlane = (xs >= low) & (xs <= high) & (ys >= low) & (ys <= high)
+            horizHits = wires[self.getClosestWires(xs[onPlane], wires)]
+            vertHits = wires[self.getClosestWires(ys[onPlane], wires)]
+            groupNamebase = self._groupNamebase(namebase, group, groupByPdg)
+            outByGroup[group] = self._makeWireProfiles(groupNamebase, horizHits, vertHits)
+        return self._groupResult(outByGroup, groupByPdg)
@@ -0,0 +1,118 @@
+#! usr/bin/env python
+import numpy as np
+from math import sqrt
+
+class ProfileStats:
+    """ This is for getting summary stats (centroid, RMS width, integrated
+    signal, peak, errors) out of the PWC wire profiles for a whole grid of
+    jobs at once. The profiles go in as one array shaped like
+    (number of jobs, 4 planes, 48 wires), with the planes in the order of
+    self.planes.
+
+    Errors use the same model as PTMPlotMaker.addBinErrs: the error on the
+    TOTAL integrated signal in one plane is totalSignalErr, distributed 
+    evenly over the wires. Pass in PTMPlotMaker.totalSignalErr if you've
+    changed it there; it isn't picked up automatically. """
+
+    def __init__(self, totalSignalErr=0.05):
+        self.planes = ["horiz1", "horiz2", "vert1", "vert2"]
+        # same wire positions as PTMDetectorReader._volIdToPosition gives;
+        # these are the bin centres of the [-48, 48] profile hists, so 
+        # centroids match TH1::GetMean on the same hist.
+        self.wirePositions = np.array([(i - 24) * 2 + 1 for i in range(48)], dtype=np.float64)
+        self.totalSignalErr = totalSignalErr
+
+    def histsToArray(self, profileDicts):
+        # profileDicts is a list of dicts like the ones
+        # PTMDetectorReader.getIonizingProfiles returns, one per job
+        numWires = len(self.wirePositions)
+        profiles = np.zeros((len(profileDicts), len(self.planes), numWires), dtype=np.float64)
+        for j, profileDict in enumerate(profileDicts):
+            for p, plane in enumerate(self.planes):
+                hist = profileDict[plane]
+                profiles[j, p, :] = [hist.GetBinContent(i) for i in range(1, numWires+1)]
+        return profiles
+
+    def computeStats(self, profiles, jobNames=None):
+        # returns a dict where the keys are job names (or job index, if no
+        # names are given) and the values are dicts of stats for each plane
+        # like:
+        # {'job1': {'horiz1': {'centroid':-6.1, 'centroidErr':0.03, 'rms':3.2,
+        #                      'integral':2.8, 'peak':0.61, 'peakPosition':-7,
+        #                      'binErr':0.02},
+        #           'horiz2': {...}, ...},
+        #  'job2': {...}}
+        # Positions are wire positions in mm. Planes with no signal get nan
+        # for the centroid, width, peak and peak position.
+        profiles = np.asarray(profiles, dtype=np.float64)
+        if profiles.ndim == 2:
+            profiles = profiles[np.newaxis, :, :]
+        if jobNames is None:
+            jobNames = range(profiles.shape[0])
+        elif len(jobNames) != profiles.shape[0]:
+            raise RuntimeError("ProfileStats: got {0} job names for {1} jobs' profiles".format(len(jobNames), profiles.shape[0]))
+        wires = self.wirePositions
+        integral = profiles.sum(axis=-1)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            centroid = (profiles * wires).sum(axis=-1) / integral
+            offsets = wires - centroid[..., np.newaxis]
+            variance = (profiles * offsets**2).sum(axis=-1) / integral
+            rms = np.sqrt(np.clip(variance, 0.0, None))
+            # every wire has the same error, binErr
+            binErr = self.totalSignalErr * integral / sqrt(len(wires))
+            centroidErr = binErr * np.sqrt((offsets**2).sum(axis=-1)) / integral
+        peakIndex = profiles.argmax(axis=-1)
+        peak = np.take_along_axis(profiles, peakIndex[..., np.newaxis], axis=-1)[..., 0]
+        peakPosition = wires[peakIndex]
+        # otherwise an empty plane looks like a peak on the first wire
+        empty = integral == 0
+        peak = np.where(empty, np.nan, peak)
+        peakPosition = np.where(empty, np.nan, peakPosition)
+
+        table = {}
+        for j, jobName in enumerate(jobNames):
+            jobStats = {}
+            for p, plane in enumerate(self.planes):
+                jobStats[plane] = {
+                    "centroid": centroid[j, p],
+                    "centroidErr": centroidErr[j, p],
+                    "rms": rms[j, p],
+                    "integral": integral[j, p],
+                    "peak": peak[j, p],
+                    "peakPosition": peakPosition[j, p],
+                    "binErr": binErr[j, p]
+                }
+            table[jobName] = jobStats
+        return table
+
+    def signalSweep(self, ionizingProfiles, conversionConsts, errFracs, saturationThresholds=None):
+        # Scanner signals and errors for every combination of conversion 
+        # constant (V/MeV), total signal error fraction and saturation 
+        # threshold (V per wire; None means no saturation), all from one
+        # (4 planes, 48 wires) array of ionizing E dep profiles. Returns a
+        # dict like:
+        # {'conversionConsts': shape (nConst,),
+        #  'errFracs': shape (nErr,),
+        #  'saturationThresholds': shape (nSat,), inf for no saturation,
+        #  'signal': shape (nConst, nSat, 4, 48),
+        #  'binErr': shape (nConst, nErr, nSat, 4)}
+        if saturationThresholds is None:
+            saturationThresholds = [None]
+        conversionConsts = np.asarray(conversionConsts, dtype=np.float64)
+        errFracs = np.asarray(errFracs, dtype=np.float64)
+        thresholds = np.array([np.inf if t is None else t for t in saturationThresholds], dtype=np.float64)
+        profiles = np.asarray(ionizingProfiles, dtype=np.float64)
+
+        signal = conversionConsts[:, np.newaxis, np.newaxis, np.newaxis] * profiles
+        signal = np.minimum(signal, thresholds[np.newaxis, :, np.newaxis, np.newaxis])
+        integral = signal.sum(axis=-1)
+        binErr = errFracs[np.newaxis, :, np.newaxis, np.newaxis] * integral[:, np.newaxis, :, :] / sqrt(profiles.shape[-1])
+
+        sweep = {
+            "conversionConsts": conversionConsts,
+            "errFracs": errFracs,
+            "saturationThresholds": thresholds,
+            "signal": signal,
+            "binErr": binErr
+        }
+        return sweep
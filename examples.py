@@ -15,6 +15,7 @@
 from PTMPlotMaker import PTMPlotMaker
 from ChainAssembler import ChainAssembler
 from PTMReader import PTMDetectorReader
+from ProfileStats import ProfileStats
 from ROOT import TCanvas
 
 # PTMPlotMaker examples
@@ -51,6 +52,9 @@ c2.Print("Example2_changeSavedPlot.pdf", "pdf")
 c2.Clear()
 
 # this clears the ntuple tchains, stored plots, data path, and job name.
+# With clearData(keepHists=True), stored plots are kept per job instead, so
+# Example1's would still be available with
+# plotMaker.heldHists.get(name, "Example1_makeAllHistsAtOnce").
 plotMaker.clearData()
 # At this point, we could populate this with completely different data
 plotMaker.dataPath = "sampleData2"
@@ -99,3 +103,24 @@ eDepHist.SetTitle("Ionizing energy deposit in vertical plane of first PWC")
 eDepHist.Draw('hist')
 c2.Print(eDepHist.GetName()+".pdf", "pdf")
 c2.Clear()
+
+
+
+print("\n\nExample of using ProfileStats:\n\n")
+
+# Stats for a grid of jobs get computed all at once from one array of 
+# profiles, shaped like (number of jobs, 4 planes, 48 wires)
+profileDicts = []
+jobNames = ["sampleData", "sampleData2"]
+for jobDir in jobNames:
+    assemb = ChainAssembler()
+    assemb.jobDirPath = jobDir
+    assemb.ntuplePath = "readPTM/ntPTM"
+    chain = assemb.createChain()
+    profileDicts.append(reader.getIonizingProfiles(chain, "Example5_"+jobDir+"_"))
+stats = ProfileStats()
+profiles = stats.histsToArray(profileDicts)
+table = stats.computeStats(profiles, jobNames)
+for jobName in jobNames:
+    vert1 = table[jobName]["vert1"]
+    print("{0}: vert1 centroid = {1:.2f} +/- {2:.2f} mm, RMS = {3:.2f} mm".format(jobName, vert1["centroid"], vert1["centroidErr"], vert1["rms"]))